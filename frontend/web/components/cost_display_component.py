@@ -4,8 +4,58 @@ Cost Display Component
 Shows real-time cost metrics in the Streamlit UI
 """
 
-import streamlit as st
-from typing import Dict, Optional
+import functools
+from typing import Dict, List, Optional, Tuple
+
+
+# streamlit is imported inside each function so non-UI consumers don't pay for it
+def _lazy_cache_data(func):
+    """Apply st.cache_data on first call instead of at import time"""
+    cached = None
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal cached
+        if cached is None:
+            import streamlit as st
+            cached = st.cache_data(max_entries=32)(func)
+        return cached(*args, **kwargs)
+    
+    return wrapper
+
+
+def _format_breakdown(breakdown: Dict) -> List[Tuple[str, str]]:
+    """Format per-agent/per-model stats as (label, caption) pairs"""
+    return [
+        (f"**{name}**", f"Calls: {stats['calls']} | Tokens: {stats['tokens']:,} | Cost: ${stats['cost']:.4f}")
+        for name, stats in breakdown.items()
+    ]
+
+
+# Cached on the session totals only; the underscored dict argument is not hashed
+@_lazy_cache_data
+def _format_session_rows(session_id: Optional[str], total_cost: float, total_tokens: int,
+                         total_calls: int, _session_metrics: Dict) -> Dict:
+    """Preformat session metrics for display"""
+    return {
+        "total_cost": f"${total_cost:.4f}",
+        "total_tokens": f"{total_tokens:,}",
+        "total_calls": total_calls,
+        "agents": _format_breakdown(_session_metrics.get("agents", {}))
+    }
+
+
+@_lazy_cache_data
+def _format_summary_rows(total_sessions: int, total_calls: int, total_cost: float,
+                         total_tokens: int, _summary: Dict) -> Dict:
+    """Preformat the overall cost summary for display"""
+    return {
+        "total_sessions": total_sessions,
+        "total_cost": f"${total_cost:.4f}",
+        "total_tokens": f"{total_tokens:,}",
+        "models": _format_breakdown(_summary.get("by_model", {}))
+    }
+
 
 def display_session_cost(session_metrics: Optional[Dict]):
     """
@@ -14,32 +64,37 @@ def display_session_cost(session_metrics: Optional[Dict]):
     Args:
         session_metrics: Session cost data from CostTracker
     """
+    import streamlit as st
+    
     if not session_metrics:
         return
     
     st.markdown("---")
     st.markdown("### 💰 Session Costs")
     
-    total_cost = session_metrics.get("total_cost", 0)
-    total_tokens = session_metrics.get("total_tokens", 0)
-    total_calls = session_metrics.get("total_calls", 0)
+    rows = _format_session_rows(
+        session_metrics.get("session_id"),
+        session_metrics.get("total_cost", 0),
+        session_metrics.get("total_tokens", 0),
+        session_metrics.get("total_calls", 0),
+        session_metrics
+    )
     
     # Main metrics
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Total Cost", f"${total_cost:.4f}")
+        st.metric("Total Cost", rows["total_cost"])
     with col2:
-        st.metric("Tokens", f"{total_tokens:,}")
+        st.metric("Tokens", rows["total_tokens"])
     
-    st.metric("LLM Calls", total_calls)
+    st.metric("LLM Calls", rows["total_calls"])
     
     # By agent breakdown
-    agents = session_metrics.get("agents", {})
-    if agents:
+    if rows["agents"]:
         st.markdown("**By Agent:**")
-        for agent, stats in agents.items():
-            st.markdown(f"**{agent}**")
-            st.caption(f"Calls: {stats['calls']} | Tokens: {stats['tokens']:,} | Cost: ${stats['cost']:.4f}")
+        for label, caption in rows["agents"]:
+            st.markdown(label)
+            st.caption(caption)
 
 
 def display_cost_summary(summary: Dict):
@@ -49,20 +104,29 @@ def display_cost_summary(summary: Dict):
     Args:
         summary: Cost summary from CostTracker.generate_summary()
     """
+    import streamlit as st
+    
     st.markdown("---")
     st.markdown("### 📊 Overall Statistics")
     
-    st.metric("Total Sessions", summary.get("total_sessions", 0))
-    st.metric("Total Cost", f"${summary.get('total_cost', 0):.4f}")
-    st.metric("Total Tokens", f"{summary.get('total_tokens', 0):,}")
+    rows = _format_summary_rows(
+        summary.get("total_sessions", 0),
+        summary.get("total_calls", 0),
+        summary.get("total_cost", 0),
+        summary.get("total_tokens", 0),
+        summary
+    )
+    
+    st.metric("Total Sessions", rows["total_sessions"])
+    st.metric("Total Cost", rows["total_cost"])
+    st.metric("Total Tokens", rows["total_tokens"])
     
     # By model breakdown
-    models = summary.get("by_model", {})
-    if models:
+    if rows["models"]:
         st.markdown("**By Model:**")
-        for model, stats in models.items():
-            st.markdown(f"**{model}**")
-            st.caption(f"Calls: {stats['calls']} | Tokens: {stats['tokens']:,} | Cost: ${stats['cost']:.4f}")
+        for label, caption in rows["models"]:
+            st.markdown(label)
+            st.caption(caption)
 
 
 def show_cost_warning(cost: float, threshold: float = 0.10):
@@ -73,6 +137,8 @@ def show_cost_warning(cost: float, threshold: float = 0.10):
         cost: Current session cost
         threshold: Warning threshold in USD
     """
+    import streamlit as st
+    
     if cost > threshold:
         st.warning(
             f"⚠️ Session cost (${cost:.4f}) exceeds ${threshold:.2f} threshold!"
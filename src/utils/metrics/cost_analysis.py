@@ -10,161 +10,281 @@ Usage:
 """
 
 import argparse
-import csv
-import json
+import io
+import sys
 from pathlib import Path
-from collections import defaultdict
-from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, Optional
 
-def load_cost_log(log_file: str = "logs/metrics/cost_log.csv") -> List[Dict]:
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+# numba is optional; without it aggregation falls back to np.bincount
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Column types for cost_log.csv (parsed in C by pandas)
+COST_LOG_DTYPES = {
+    'timestamp': str,
+    'session_id': str,
+    'agent_name': str,
+    'model': str,
+    'provider': str,
+    'input_tokens': 'int32',
+    'output_tokens': 'int32',
+    'total_tokens': 'int32',
+    'input_cost': 'float64',
+    'output_cost': 'float64',
+    'total_cost': 'float64',
+    'latency_ms': 'float32'
+}
+
+# Same columns as Arrow types, used when streaming the log in batches
+COST_LOG_ARROW_TYPES = {
+    'timestamp': pa.string(),
+    'session_id': pa.string(),
+    'agent_name': pa.string(),
+    'model': pa.string(),
+    'provider': pa.string(),
+    'input_tokens': pa.int32(),
+    'output_tokens': pa.int32(),
+    'total_tokens': pa.int32(),
+    'input_cost': pa.float64(),
+    'output_cost': pa.float64(),
+    'total_cost': pa.float64(),
+    'latency_ms': pa.float32()
+}
+
+# Bytes read per record batch when streaming
+STREAM_BLOCK_SIZE = 1 << 20
+
+def _empty_cost_log() -> pd.DataFrame:
+    """Empty cost log with the expected columns and types"""
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in COST_LOG_DTYPES.items()})
+
+def load_cost_log(log_file: str = "logs/metrics/cost_log.csv") -> pd.DataFrame:
     """Load cost log from CSV"""
     if not Path(log_file).exists():
         print(f"❌ Cost log not found: {log_file}")
-        return []
-    
-    rows = []
-    with open(log_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # Convert numeric fields
-            row['input_tokens'] = int(row['input_tokens'])
-            row['output_tokens'] = int(row['output_tokens'])
-            row['total_tokens'] = int(row['total_tokens'])
-            row['input_cost'] = float(row['input_cost'])
-            row['output_cost'] = float(row['output_cost'])
-            row['total_cost'] = float(row['total_cost'])
-            row['latency_ms'] = float(row['latency_ms'])
-            rows.append(row)
-    
-    return rows
-
-def analyze_by_session(rows: List[Dict]) -> Dict:
+        return _empty_cost_log()
+    
+    # A tracker killed before writing the header leaves a 0-byte file
+    if Path(log_file).stat().st_size == 0:
+        return _empty_cost_log()
+    
+    # Keep empty names as "" (like the Arrow reader) so every row lands in a group
+    return pd.read_csv(log_file, dtype=COST_LOG_DTYPES, keep_default_na=False)
+
+def iter_cost_log(log_file: str = "logs/metrics/cost_log.csv",
+                  block_size: int = STREAM_BLOCK_SIZE) -> Iterator[pd.DataFrame]:
+    """Stream the cost log one record batch at a time"""
+    if not Path(log_file).exists():
+        print(f"❌ Cost log not found: {log_file}")
+        return
+    
+    # Arrow rejects a 0-byte file outright; it simply has no batches
+    if Path(log_file).stat().st_size == 0:
+        return
+    
+    reader = pa_csv.open_csv(
+        log_file,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=COST_LOG_ARROW_TYPES)
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+def _aggregate_numpy(codes: np.ndarray, tokens: np.ndarray, costs: np.ndarray, n_groups: int):
+    """Per-group call count, token sum and cost sum via np.bincount"""
+    return (
+        np.bincount(codes, minlength=n_groups),
+        np.bincount(codes, weights=tokens, minlength=n_groups).astype(np.int64),
+        np.bincount(codes, weights=costs, minlength=n_groups)
+    )
+
+if njit is not None:
+    @njit(cache=True)
+    def _aggregate(codes, tokens, costs, n_groups):
+        """Per-group call count, token sum and cost sum in a single pass"""
+        calls = np.zeros(n_groups, np.int64)
+        token_sums = np.zeros(n_groups, np.int64)
+        cost_sums = np.zeros(n_groups, np.float64)
+        for i in range(codes.shape[0]):
+            group = codes[i]
+            calls[group] += 1
+            token_sums[group] += tokens[i]
+            cost_sums[group] += costs[i]
+        return calls, token_sums, cost_sums
+else:
+    _aggregate = _aggregate_numpy
+
+def _group_stats(rows: pd.DataFrame, keys) -> pd.DataFrame:
+    """Sum calls, tokens and cost per group"""
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    if len(keys) == 1:
+        index = pd.Index(rows[keys[0]])
+    else:
+        index = pd.MultiIndex.from_arrays([rows[key] for key in keys])
+    
+    # Map each row to an integer group code once, then reduce every column in compiled code
+    codes, groups = index.factorize()
+    calls, tokens, cost = _aggregate(
+        codes,
+        rows['total_tokens'].to_numpy(dtype=np.int64),
+        rows['total_cost'].to_numpy(dtype=np.float64),
+        len(groups)
+    )
+    return pd.DataFrame({'calls': calls, 'tokens': tokens, 'cost': cost}, index=groups)
+
+def _fold_stats(totals: Optional[pd.DataFrame], part: pd.DataFrame) -> pd.DataFrame:
+    """Add one batch's group stats into the running totals"""
+    if totals is None:
+        return part
+    return totals.add(part, fill_value=0)
+
+def _stats_to_dict(grouped: pd.DataFrame) -> Dict:
+    """Convert grouped stats to {key: {"calls", "tokens", "cost"}}"""
+    return {
+        key: {"calls": int(calls), "tokens": int(tokens), "cost": float(cost)}
+        for key, calls, tokens, cost in grouped.itertuples(name=None)
+    }
+
+def analyze_by_session(rows: pd.DataFrame) -> Dict:
     """Analyze costs grouped by session"""
-    sessions = defaultdict(lambda: {
-        "calls": 0,
-        "tokens": 0,
-        "cost": 0.0,
-        "agents": defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0}),
-        "models": defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
-    })
-    
-    for row in rows:
-        session_id = row['session_id']
-        agent = row['agent_name']
-        model = row['model']
-        
-        sessions[session_id]["calls"] += 1
-        sessions[session_id]["tokens"] += row['total_tokens']
-        sessions[session_id]["cost"] += row['total_cost']
-        
-        sessions[session_id]["agents"][agent]["calls"] += 1
-        sessions[session_id]["agents"][agent]["tokens"] += row['total_tokens']
-        sessions[session_id]["agents"][agent]["cost"] += row['total_cost']
-        
-        sessions[session_id]["models"][model]["calls"] += 1
-        sessions[session_id]["models"][model]["tokens"] += row['total_tokens']
-        sessions[session_id]["models"][model]["cost"] += row['total_cost']
-    
-    return dict(sessions)
-
-def analyze_by_agent(rows: List[Dict]) -> Dict:
-    """Analyze costs grouped by agent"""
-    agents = defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
+    sessions = {
+        session_id: {**stats, "agents": {}, "models": {}}
+        for session_id, stats in _stats_to_dict(_group_stats(rows, 'session_id')).items()
+    }
     
-    for row in rows:
-        agent = row['agent_name']
-        agents[agent]["calls"] += 1
-        agents[agent]["tokens"] += row['total_tokens']
-        agents[agent]["cost"] += row['total_cost']
+    for (session_id, agent), stats in _stats_to_dict(_group_stats(rows, ['session_id', 'agent_name'])).items():
+        sessions[session_id]["agents"][agent] = stats
     
-    return dict(agents)
+    for (session_id, model), stats in _stats_to_dict(_group_stats(rows, ['session_id', 'model'])).items():
+        sessions[session_id]["models"][model] = stats
+    
+    return sessions
+
+def analyze_by_agent(rows: pd.DataFrame) -> Dict:
+    """Analyze costs grouped by agent"""
+    return _stats_to_dict(_group_stats(rows, 'agent_name'))
 
-def analyze_by_model(rows: List[Dict]) -> Dict:
+def analyze_by_model(rows: pd.DataFrame) -> Dict:
     """Analyze costs grouped by model"""
-    models = defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
+    return _stats_to_dict(_group_stats(rows, 'model'))
+
+def summarize_cost_log(batches: Iterable[pd.DataFrame]) -> Dict:
+    """Aggregate overall, per-session, per-agent and per-model stats batch by batch"""
+    # Running totals only: memory depends on the number of groups, not rows
+    sessions = agents = models = None
+    for batch in batches:
+        if batch.empty:
+            continue
+        sessions = _fold_stats(sessions, _group_stats(batch, 'session_id'))
+        agents = _fold_stats(agents, _group_stats(batch, 'agent_name'))
+        models = _fold_stats(models, _group_stats(batch, 'model'))
     
-    for row in rows:
-        model = row['model']
-        models[model]["calls"] += 1
-        models[model]["tokens"] += row['total_tokens']
-        models[model]["cost"] += row['total_cost']
+    if sessions is None:
+        return {}
     
-    return dict(models)
+    return {
+        "total_calls": int(sessions['calls'].sum()),
+        "total_tokens": int(sessions['tokens'].sum()),
+        "total_cost": float(sessions['cost'].sum()),
+        "sessions": _stats_to_dict(sessions),
+        "agents": _stats_to_dict(agents),
+        "models": _stats_to_dict(models)
+    }
 
-def print_summary(rows: List[Dict]):
+def load_session_rows(log_file: str, session_id: str) -> pd.DataFrame:
+    """Collect the rows of a single session while streaming the log"""
+    parts = [batch[batch['session_id'] == session_id] for batch in iter_cost_log(log_file)]
+    if not parts:
+        return _empty_cost_log()
+    return pd.concat(parts, ignore_index=True)
+
+def print_summary(summary: Dict):
     """Print overall cost summary"""
-    if not rows:
+    if not summary:
         print("No cost data available.")
         return
     
-    total_calls = len(rows)
-    total_tokens = sum(r['total_tokens'] for r in rows)
-    total_cost = sum(r['total_cost'] for r in rows)
+    total_calls = summary["total_calls"]
+    total_tokens = summary["total_tokens"]
+    total_cost = summary["total_cost"]
+    
+    sessions = summary["sessions"]
+    agents = summary["agents"]
+    models = summary["models"]
     
-    sessions = analyze_by_session(rows)
-    agents = analyze_by_agent(rows)
-    models = analyze_by_model(rows)
+    buf = io.StringIO()
     
-    print("\n" + "="*60)
-    print("📊 COST TRACKING SUMMARY")
-    print("="*60)
+    print("\n" + "="*60, file=buf)
+    print("📊 COST TRACKING SUMMARY", file=buf)
+    print("="*60, file=buf)
     
-    print(f"\n📈 Overall Statistics:")
-    print(f"  Total Sessions:  {len(sessions)}")
-    print(f"  Total LLM Calls: {total_calls:,}")
-    print(f"  Total Tokens:    {total_tokens:,}")
-    print(f"  Total Cost:      ${total_cost:.4f}")
+    print(f"\n📈 Overall Statistics:", file=buf)
+    print(f"  Total Sessions:  {len(sessions)}", file=buf)
+    print(f"  Total LLM Calls: {total_calls:,}", file=buf)
+    print(f"  Total Tokens:    {total_tokens:,}", file=buf)
+    print(f"  Total Cost:      ${total_cost:.4f}", file=buf)
     
-    print(f"\n🤖 By Agent:")
+    print(f"\n🤖 By Agent:", file=buf)
     for agent, stats in sorted(agents.items(), key=lambda x: x[1]['cost'], reverse=True):
-        print(f"  {agent:20} | Calls: {stats['calls']:3} | Tokens: {stats['tokens']:7,} | Cost: ${stats['cost']:.4f}")
+        print(f"  {agent:20} | Calls: {stats['calls']:3} | Tokens: {stats['tokens']:7,} | Cost: ${stats['cost']:.4f}", file=buf)
     
-    print(f"\n🔧 By Model:")
+    print(f"\n🔧 By Model:", file=buf)
     for model, stats in sorted(models.items(), key=lambda x: x[1]['cost'], reverse=True):
-        print(f"  {model:30} | Calls: {stats['calls']:3} | Tokens: {stats['tokens']:7,} | Cost: ${stats['cost']:.4f}")
+        print(f"  {model:30} | Calls: {stats['calls']:3} | Tokens: {stats['tokens']:7,} | Cost: ${stats['cost']:.4f}", file=buf)
+    
+    print("\n" + "="*60 + "\n", file=buf)
     
-    print("\n" + "="*60 + "\n")
+    # Emit the whole report with a single write
+    sys.stdout.write(buf.getvalue())
 
-def print_session_detail(rows: List[Dict], session_id: str):
+def print_session_detail(rows: pd.DataFrame, session_id: str):
     """Print detailed breakdown for a specific session"""
-    session_rows = [r for r in rows if r['session_id'] == session_id]
+    session_rows = rows[rows['session_id'] == session_id]
     
-    if not session_rows:
+    if session_rows.empty:
         print(f"❌ No data found for session: {session_id}")
         return
     
-    total_cost = sum(r['total_cost'] for r in session_rows)
-    total_tokens = sum(r['total_tokens'] for r in session_rows)
+    total_cost = float(session_rows['total_cost'].sum())
+    total_tokens = int(session_rows['total_tokens'].sum())
     
-    agents = defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
-    for row in session_rows:
-        agent = row['agent_name']
-        agents[agent]["calls"] += 1
-        agents[agent]["tokens"] += row['total_tokens']
-        agents[agent]["cost"] += row['total_cost']
+    agents = analyze_by_agent(session_rows)
     
-    print("\n" + "="*60)
-    print(f"📋 SESSION DETAIL: {session_id}")
-    print("="*60)
+    buf = io.StringIO()
     
-    print(f"\n📊 Session Statistics:")
-    print(f"  Total LLM Calls: {len(session_rows)}")
-    print(f"  Total Tokens:    {total_tokens:,}")
-    print(f"  Total Cost:      ${total_cost:.4f}")
+    print("\n" + "="*60, file=buf)
+    print(f"📋 SESSION DETAIL: {session_id}", file=buf)
+    print("="*60, file=buf)
     
-    print(f"\n🤖 By Agent:")
+    print(f"\n📊 Session Statistics:", file=buf)
+    print(f"  Total LLM Calls: {len(session_rows)}", file=buf)
+    print(f"  Total Tokens:    {total_tokens:,}", file=buf)
+    print(f"  Total Cost:      ${total_cost:.4f}", file=buf)
+    
+    print(f"\n🤖 By Agent:", file=buf)
     for agent, stats in sorted(agents.items(), key=lambda x: x[1]['cost'], reverse=True):
-        print(f"  {agent:20} | Calls: {stats['calls']:3} | Tokens: {stats['tokens']:7,} | Cost: ${stats['cost']:.4f}")
+        print(f"  {agent:20} | Calls: {stats['calls']:3} | Tokens: {stats['tokens']:7,} | Cost: ${stats['cost']:.4f}", file=buf)
+    
+    print(f"\n📝 Call History:", file=buf)
+    print("\n".join(
+        f"  [{i:2}] {row['timestamp'][:19]} | {row['agent_name']:15} | "
+        f"{row['model']:25} | "
+        f"Tokens: {row['input_tokens']:4}+{row['output_tokens']:4} | "
+        f"Cost: ${row['total_cost']:.6f}"
+        for i, row in enumerate(session_rows.to_dict('records'), 1)
+    ), file=buf)
     
-    print(f"\n📝 Call History:")
-    for i, row in enumerate(session_rows, 1):
-        print(f"  [{i:2}] {row['timestamp'][:19]} | {row['agent_name']:15} | "
-              f"{row['model']:25} | "
-              f"Tokens: {row['input_tokens']:4}+{row['output_tokens']:4} | "
-              f"Cost: ${row['total_cost']:.6f}")
+    print("\n" + "="*60 + "\n", file=buf)
     
-    print("\n" + "="*60 + "\n")
+    # Emit the whole report with a single write
+    sys.stdout.write(buf.getvalue())
 
 def main():
     parser = argparse.ArgumentParser(description="Cost Tracking Analysis Tool")
@@ -175,24 +295,29 @@ def main():
     
     args = parser.parse_args()
     
-    rows = load_cost_log(args.log_file)
+    if not Path(args.log_file).exists():
+        print(f"❌ Cost log not found: {args.log_file}")
+        return
+    
+    # Stream the log so memory stays bounded regardless of file size
+    if args.session:
+        print_session_detail(load_session_rows(args.log_file, args.session), args.session)
+        return
+    
+    summary = summarize_cost_log(iter_cost_log(args.log_file))
     
-    if not rows:
+    if not summary:
         return
     
     if args.list_sessions:
-        sessions = set(r['session_id'] for r in rows)
+        sessions = summary["sessions"]
         print("\n📁 Available Sessions:")
         for session_id in sorted(sessions):
-            session_rows = [r for r in rows if r['session_id'] == session_id]
-            cost = sum(r['total_cost'] for r in session_rows)
-            calls = len(session_rows)
-            print(f"  {session_id} ({calls} calls, ${cost:.4f})")
+            stats = sessions[session_id]
+            print(f"  {session_id} ({stats['calls']} calls, ${stats['cost']:.4f})")
         print()
-    elif args.session:
-        print_session_detail(rows, args.session)
     else:
-        print_summary(rows)
+        print_summary(summary)
 
 if __name__ == "__main__":
     main()
@@ -5,18 +5,48 @@ Tracks token usage and calculates costs per model, per agent, and per session.
 Logs to CSV and provides real-time metrics.
 """
 
+import atexit
 import csv
 import os
 import json
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, List
-from dataclasses import dataclass, asdict
+from typing import Dict, Optional, List, Tuple
+from dataclasses import dataclass, asdict, fields
+from operator import attrgetter
 import logging
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# orjson is optional; fall back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(obj, indent: bool = False) -> bytes:
+    """Serialize to JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
+
+def _json_loads(data):
+    """Parse JSON from bytes or str, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Maximum queued calls the writer thread persists per flush
+WRITE_BATCH_SIZE = 64
+
+# Compact the session journal into session_costs.json every N events
+CHECKPOINT_EVERY = 100
+
+@dataclass(slots=True)
 class LLMCallMetrics:
     """Metrics for a single LLM call"""
     timestamp: str
@@ -32,6 +62,10 @@ class LLMCallMetrics:
     total_cost: float
     latency_ms: float
 
+# cost_log.csv columns, in LLMCallMetrics field order
+_FIELDS = tuple(f.name for f in fields(LLMCallMetrics))
+_get_row = attrgetter(*_FIELDS)
+
 # Model pricing (cost per 1M tokens in USD)
 MODEL_PRICING = {
     "gpt-4o-mini": {
@@ -60,6 +94,102 @@ MODEL_PRICING = {
     }
 }
 
+# Per-token (input, output) prices keyed by lowercased model name
+_PRICING_FLAT = {
+    name.lower(): (pricing["input"] / 1_000_000, pricing["output"] / 1_000_000)
+    for name, pricing in MODEL_PRICING.items()
+}
+_DEFAULT_PRICING = _PRICING_FLAT["gpt-4o-mini"]
+
+
+def _compute_costs(model: str, input_tokens: int, output_tokens: int) -> Tuple[float, float, float]:
+    """Return (input_cost, output_cost, total_cost) for a call"""
+    # Per-token pricing for model (default to gpt-4o-mini if unknown)
+    input_price, output_price = _PRICING_FLAT.get(model.lower() if isinstance(model, str) else model, _DEFAULT_PRICING)
+    input_cost = input_tokens * input_price
+    output_cost = output_tokens * output_price
+    return input_cost, output_cost, input_cost + output_cost
+
+
+def _journal_line(metrics: LLMCallMetrics) -> bytes:
+    """Encode a call as one session journal entry"""
+    return _json_dumps({
+        "session_id": metrics.session_id,
+        "delta_tokens": metrics.total_tokens,
+        "delta_cost": metrics.total_cost,
+        "agent": metrics.agent_name,
+        "model": metrics.model,
+        "ts": metrics.timestamp
+    }) + b"\n"
+
+
+def _add_stats(totals: Dict, key, calls: int, tokens: int, cost: float):
+    """Accumulate calls/tokens/cost into totals[key] and return that entry"""
+    stats = totals.get(key)
+    if stats is None:
+        stats = totals[key] = {"calls": 0, "tokens": 0, "cost": 0.0}
+    stats["calls"] += calls
+    stats["tokens"] += tokens
+    stats["cost"] += cost
+    return stats
+
+
+class _SessionAggregates:
+    """Session costs keyed by session_id, each holding its own per-agent and
+    per-model stats so one session's breakdown is read without a scan"""
+    
+    def __init__(self):
+        self.sessions: Dict[str, Dict] = {}
+    
+    def apply(self, session_id: str, agent: str, model: str, tokens: int, cost: float, ts: str):
+        """Add a single call's tokens and cost to the aggregates"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = {
+                "session_id": session_id,
+                "start_time": ts,
+                "last_update": ts,
+                "total_calls": 0,
+                "total_tokens": 0,
+                "total_cost": 0.0,
+                "agents": {},
+                "models": {}
+            }
+        
+        session["last_update"] = ts
+        session["total_calls"] += 1
+        session["total_tokens"] += tokens
+        session["total_cost"] += cost
+        
+        # Track by agent and by model
+        _add_stats(session["agents"], agent, 1, tokens, cost)
+        _add_stats(session["models"], model, 1, tokens, cost)
+    
+    def load(self, sessions: Dict[str, Dict]):
+        """Copy nested session summaries into the aggregates"""
+        for session_id, session in sessions.items():
+            self.sessions[session_id] = _copy_session(session)
+    
+    def session(self, session_id: str) -> Optional[Dict]:
+        """Nested summary for one session"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        return _copy_session(session)
+    
+    def to_dict(self) -> Dict[str, Dict]:
+        """Nested summaries for all sessions (session_costs.json format)"""
+        return {session_id: _copy_session(session) for session_id, session in self.sessions.items()}
+
+
+def _copy_session(session: Dict) -> Dict:
+    """Copy a session summary deep enough that callers can't mutate the aggregates"""
+    return {
+        **session,
+        "agents": {agent: dict(stats) for agent, stats in session.get("agents", {}).items()},
+        "models": {model: dict(stats) for model, stats in session.get("models", {}).items()}
+    }
+
 class CostTracker:
     """Tracks LLM usage and costs"""
     
@@ -69,59 +199,68 @@ class CostTracker:
         
         self.csv_file = self.log_dir / "cost_log.csv"
         self.session_file = self.log_dir / "session_costs.json"
+        self.journal_file = self.log_dir / "session_costs.jsonl"
         
-        # In-memory session tracking
-        self.session_costs: Dict[str, Dict] = {}
+        # Live aggregates serve readers and are updated on every call under the
+        # lock. Persisted aggregates are owned by the writer thread and only
+        # include calls already written to the CSV log and journal, so a
+        # checkpoint never gets ahead of the files on disk.
+        self._live = _SessionAggregates()
+        self._persisted = _SessionAggregates()
+        
+        # Finish a checkpoint interrupted by a crash before loading anything
+        self._recover_checkpoint()
         
         # Load existing session costs if available
         if self.session_file.exists():
             try:
-                with open(self.session_file, 'r') as f:
-                    self.session_costs = json.load(f)
+                sessions = _json_loads(self.session_file.read_bytes())
+                self._live.load(sessions)
+                self._persisted.load(sessions)
             except Exception as e:
                 logger.error(f"Failed to load session costs: {e}")
-                self.session_costs = {}
+                self._live, self._persisted = _SessionAggregates(), _SessionAggregates()
+        
+        # Replay events journaled since the last checkpoint
+        self._replay_journal()
         
         # Initialize CSV if doesn't exist
         if not self.csv_file.exists():
             self._init_csv()
         
+        # Keep the CSV log open and buffered instead of reopening it per call
+        self._csv_fh = open(self.csv_file, 'a', newline='', buffering=1 << 16)
+        self._csv_writer = csv.writer(self._csv_fh)
+        
+        # Session updates are appended as deltas and compacted periodically
+        self._journal = open(self.journal_file, 'ab')
+        self._journal_events = 0
+        
+        # Live state is guarded by the lock; all file IO happens on the writer thread
+        self._lock = threading.RLock()
+        self._closed = False
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="CostTrackerWriter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+        
         logger.info(f"CostTracker initialized. Logging to {self.csv_file}")
     
     def _init_csv(self):
         """Initialize CSV file with headers"""
         with open(self.csv_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                'timestamp',
-                'session_id',
-                'agent_name',
-                'model',
-                'provider',
-                'input_tokens',
-                'output_tokens',
-                'total_tokens',
-                'input_cost',
-                'output_cost',
-                'total_cost',
-                'latency_ms'
-            ])
+            csv.writer(f).writerow(_FIELDS)
     
     def calculate_cost(self, model: str, input_tokens: int, output_tokens: int) -> Dict[str, float]:
         """Calculate cost for a given model and token usage"""
         
-        # Get pricing for model (default to gpt-4o-mini if unknown)
-        pricing = MODEL_PRICING.get(model, MODEL_PRICING["gpt-4o-mini"])
-        
-        # Calculate costs (pricing is per 1M tokens)
-        input_cost = (input_tokens / 1_000_000) * pricing["input"]
-        output_cost = (output_tokens / 1_000_000) * pricing["output"]
-        total_cost = input_cost + output_cost
+        input_cost, output_cost, total_cost = _compute_costs(model, input_tokens, output_tokens)
         
+        # Keep full precision; rounding happens at display time
         return {
-            "input_cost": round(input_cost, 6),
-            "output_cost": round(output_cost, 6),
-            "total_cost": round(total_cost, 6)
+            "input_cost": input_cost,
+            "output_cost": output_cost,
+            "total_cost": total_cost
         }
     
     def track_call(
@@ -150,8 +289,8 @@ class CostTracker:
             LLMCallMetrics with calculated costs
         """
         
-        # Calculate costs
-        costs = self.calculate_cost(model, input_tokens, output_tokens)
+        # Calculate costs (tuple form; skips the dict built by calculate_cost)
+        input_cost, output_cost, total_cost = _compute_costs(model, input_tokens, output_tokens)
         
         # Create metrics object
         metrics = LLMCallMetrics(
@@ -163,143 +302,228 @@ class CostTracker:
             input_tokens=input_tokens,
             output_tokens=output_tokens,
             total_tokens=input_tokens + output_tokens,
-            input_cost=costs["input_cost"],
-            output_cost=costs["output_cost"],
-            total_cost=costs["total_cost"],
+            input_cost=input_cost,
+            output_cost=output_cost,
+            total_cost=total_cost,
             latency_ms=latency_ms
         )
         
-        # Log to CSV
-        self._log_to_csv(metrics)
+        # Update session tracking, then hand persistence to the writer thread
+        with self._lock:
+            self._update_session(metrics)
+            # Enqueue under the lock so nothing lands behind close()'s sentinel
+            closed = self._closed
+            if not closed:
+                self._queue.put_nowait(metrics)
         
-        # Update session tracking
-        self._update_session(metrics)
+        if closed:
+            logger.warning("CostTracker is closed; call tracked in memory only")
         
-        logger.debug(f"Tracked LLM call: {agent_name} | {model} | "
-                    f"Tokens: {input_tokens}+{output_tokens} | "
-                    f"Cost: ${costs['total_cost']:.6f}")
+        # Lazy %-formatting: the message is only built when debug logging is on
+        logger.debug("Tracked LLM call: %s | %s | Tokens: %d+%d | Cost: $%.6f",
+                     agent_name, model, input_tokens, output_tokens, total_cost)
         
         return metrics
     
-    def _log_to_csv(self, metrics: LLMCallMetrics):
-        """Append metrics to CSV log"""
+    def _writer_loop(self):
+        """Persist queued calls in batches until close() sends None"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            self._write_batch([item for item in batch if item is not None])
+            for _ in batch:
+                self._queue.task_done()
+            
+            if None in batch:
+                return
+    
+    def _write_batch(self, batch: List[LLMCallMetrics]):
+        """Append a batch of calls to the CSV log and session journal"""
+        if not batch:
+            return
+        
         try:
-            with open(self.csv_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    metrics.timestamp,
-                    metrics.session_id,
-                    metrics.agent_name,
-                    metrics.model,
-                    metrics.provider,
-                    metrics.input_tokens,
-                    metrics.output_tokens,
-                    metrics.total_tokens,
-                    metrics.input_cost,
-                    metrics.output_cost,
-                    metrics.total_cost,
-                    metrics.latency_ms
-                ])
+            for metrics in batch:
+                self._csv_writer.writerow(_get_row(metrics))
+                self._journal.write(_journal_line(metrics))
+                self._persisted.apply(
+                    session_id=metrics.session_id,
+                    agent=metrics.agent_name,
+                    model=metrics.model,
+                    tokens=metrics.total_tokens,
+                    cost=metrics.total_cost,
+                    ts=metrics.timestamp
+                )
+                self._journal_events += 1
+            self._csv_fh.flush()
+            self._journal.flush()
         except Exception as e:
-            logger.error(f"Failed to log to CSV: {e}")
+            logger.error(f"Failed to write cost batch: {e}")
+        
+        if self._journal_events >= CHECKPOINT_EVERY:
+            self._checkpoint()
+    
+    def flush(self):
+        """Block until every queued call has been written to disk"""
+        if self._closed:
+            return
+        self._queue.join()
+    
+    def close(self):
+        """Stop the writer thread, checkpoint session costs and close the log files"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._writer.join()
+        self._checkpoint()
+        self._csv_fh.close()
+        self._journal.close()
+        atexit.unregister(self.close)
     
     def _update_session(self, metrics: LLMCallMetrics):
         """Update in-memory session tracking"""
-        session_id = metrics.session_id
-        
-        if session_id not in self.session_costs:
-            self.session_costs[session_id] = {
-                "session_id": session_id,
-                "start_time": metrics.timestamp,
-                "last_update": metrics.timestamp,
-                "total_calls": 0,
-                "total_tokens": 0,
-                "total_cost": 0.0,
-                "agents": {},
-                "models": {}
-            }
-        
-        session = self.session_costs[session_id]
-        session["last_update"] = metrics.timestamp
-        session["total_calls"] += 1
-        session["total_tokens"] += metrics.total_tokens
-        session["total_cost"] += metrics.total_cost
-        
-        # Track by agent
-        agent = metrics.agent_name
-        if agent not in session["agents"]:
-            session["agents"][agent] = {
-                "calls": 0,
-                "tokens": 0,
-                "cost": 0.0
-            }
-        session["agents"][agent]["calls"] += 1
-        session["agents"][agent]["tokens"] += metrics.total_tokens
-        session["agents"][agent]["cost"] += metrics.total_cost
-        
-        # Track by model
-        model = metrics.model
-        if model not in session["models"]:
-            session["models"][model] = {
-                "calls": 0,
-                "tokens": 0,
-                "cost": 0.0
-            }
-        session["models"][model]["calls"] += 1
-        session["models"][model]["tokens"] += metrics.total_tokens
-        session["models"][model]["cost"] += metrics.total_cost
+        self._live.apply(
+            session_id=metrics.session_id,
+            agent=metrics.agent_name,
+            model=metrics.model,
+            tokens=metrics.total_tokens,
+            cost=metrics.total_cost,
+            ts=metrics.timestamp
+        )
+    
+    def _recover_checkpoint(self):
+        """Roll an interrupted checkpoint forward or discard it"""
+        tmp_file = self.session_file.with_suffix('.json.tmp')
+        rotated_file = self.journal_file.with_suffix('.jsonl.old')
+        try:
+            if rotated_file.exists():
+                # The rotated journal is only created after the new snapshot
+                # was fully written; if that snapshot is still aside, swap it in
+                if tmp_file.exists():
+                    os.replace(tmp_file, self.session_file)
+                rotated_file.unlink()
+            elif tmp_file.exists():
+                # Journal was never rotated, so the old snapshot is still valid
+                tmp_file.unlink()
+        except Exception as e:
+            logger.error(f"Failed to recover session checkpoint: {e}")
+    
+    def _replay_journal(self):
+        """Rebuild session costs from journal entries newer than the snapshot"""
+        if not self.journal_file.exists():
+            return
+        try:
+            data = self.journal_file.read_bytes()
+            
+            # A crash mid-write can leave a torn last line; cut it off so new
+            # entries are not appended onto the fragment
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                logger.warning(f"Dropping torn tail of {self.journal_file}")
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(end)
+        except Exception as e:
+            logger.error(f"Failed to replay session journal: {e}")
+            return
         
-        # Persist to disk
-        self._save_session_costs()
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = _json_loads(line)
+                delta = dict(
+                    session_id=entry["session_id"],
+                    agent=entry["agent"],
+                    model=entry["model"],
+                    tokens=entry["delta_tokens"],
+                    cost=entry["delta_cost"],
+                    ts=entry["ts"]
+                )
+            except Exception as e:
+                logger.warning(f"Skipping unreadable journal entry: {e}")
+                continue
+            for aggregates in (self._live, self._persisted):
+                aggregates.apply(**delta)
     
-    def _save_session_costs(self):
-        """Save session costs to JSON file"""
+    def _checkpoint(self):
+        """Compact the journal into session_costs.json (writer thread only)"""
+        # Order matters for crash safety (see _recover_checkpoint): write the
+        # new snapshot aside, rotate the journal, then swap the snapshot in
         try:
-            with open(self.session_file, 'w') as f:
-                json.dump(self.session_costs, f, indent=2)
+            sessions = self._persisted.to_dict()
+            
+            tmp_file = self.session_file.with_suffix('.json.tmp')
+            rotated_file = self.journal_file.with_suffix('.jsonl.old')
+            tmp_file.write_bytes(_json_dumps(sessions, indent=True))
+            
+            # Only swap handles once the fresh journal is open; on failure put
+            # the old journal back so writes keep going where replay looks
+            self._journal.flush()
+            os.replace(self.journal_file, rotated_file)
+            try:
+                journal = open(self.journal_file, 'ab')
+            except Exception:
+                os.replace(rotated_file, self.journal_file)
+                raise
+            self._journal.close()
+            self._journal = journal
+            
+            os.replace(tmp_file, self.session_file)
+            rotated_file.unlink()
+            
+            self._journal_events = 0
         except Exception as e:
             logger.error(f"Failed to save session costs: {e}")
     
+    def reset(self):
+        """Clear in-memory session totals (the CSV log and session snapshot on disk are kept)"""
+        with self._lock:
+            self._live = _SessionAggregates()
+    
     def get_session_cost(self, session_id: str) -> Optional[Dict]:
         """Get cost summary for a specific session"""
-        return self.session_costs.get(session_id)
+        with self._lock:
+            return self._live.session(session_id)
     
     def get_all_sessions(self) -> Dict[str, Dict]:
         """Get all session cost summaries"""
-        return self.session_costs
+        with self._lock:
+            return self._live.to_dict()
     
     def get_total_cost(self) -> float:
         """Get total cost across all sessions"""
-        return sum(s["total_cost"] for s in self.session_costs.values())
+        with self._lock:
+            return sum(s["total_cost"] for s in self._live.sessions.values())
     
     def generate_summary(self) -> Dict:
         """Generate overall cost summary"""
-        total_calls = sum(s["total_calls"] for s in self.session_costs.values())
-        total_tokens = sum(s["total_tokens"] for s in self.session_costs.values())
-        total_cost = self.get_total_cost()
-        
-        # Aggregate by agent across all sessions
-        agent_totals = {}
-        for session in self.session_costs.values():
-            for agent, stats in session["agents"].items():
-                if agent not in agent_totals:
-                    agent_totals[agent] = {"calls": 0, "tokens": 0, "cost": 0.0}
-                agent_totals[agent]["calls"] += stats["calls"]
-                agent_totals[agent]["tokens"] += stats["tokens"]
-                agent_totals[agent]["cost"] += stats["cost"]
-        
-        # Aggregate by model
-        model_totals = {}
-        for session in self.session_costs.values():
-            for model, stats in session["models"].items():
-                if model not in model_totals:
-                    model_totals[model] = {"calls": 0, "tokens": 0, "cost": 0.0}
-                model_totals[model]["calls"] += stats["calls"]
-                model_totals[model]["tokens"] += stats["tokens"]
-                model_totals[model]["cost"] += stats["cost"]
+        with self._lock:
+            total_sessions = len(self._live.sessions)
+            total_calls = sum(s["total_calls"] for s in self._live.sessions.values())
+            total_tokens = sum(s["total_tokens"] for s in self._live.sessions.values())
+            total_cost = self.get_total_cost()
+            
+            # Aggregate by agent across all sessions
+            agent_totals = {}
+            for session in self._live.sessions.values():
+                for agent, stats in session["agents"].items():
+                    _add_stats(agent_totals, agent, stats["calls"], stats["tokens"], stats["cost"])
+            
+            # Aggregate by model
+            model_totals = {}
+            for session in self._live.sessions.values():
+                for model, stats in session["models"].items():
+                    _add_stats(model_totals, model, stats["calls"], stats["tokens"], stats["cost"])
         
         return {
-            "total_sessions": len(self.session_costs),
+            "total_sessions": total_sessions,
             "total_calls": total_calls,
             "total_tokens": total_tokens,
             "total_cost": round(total_cost, 6),
@@ -317,3 +541,7 @@ def get_cost_tracker() -> CostTracker:
     if _cost_tracker is None:
         _cost_tracker = CostTracker()
     return _cost_tracker
+
+def reset_cost_tracker():
+    """Reset the global cost tracker's in-memory session totals"""
+    get_cost_tracker().reset()
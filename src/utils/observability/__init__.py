@@ -3,13 +3,20 @@ Observability module for tracing and monitoring
 """
 
 from typing import Dict, Any, Optional
+from collections import deque
 from enum import Enum
 from datetime import datetime
+import atexit
+import json
 import logging
+import time
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Default number of trace events kept in memory
+MAX_TRACES = 10000
+
 
 class TraceEventType(Enum):
     """Types of trace events"""
@@ -23,23 +30,53 @@ class TraceEventType(Enum):
     ERROR = "error"
 
 
+# Enum .value goes through a descriptor; a plain dict lookup is cheaper per event
+_ETYPE_VALS = {member: member.value for member in TraceEventType}
+_AGENT_RESPONSE = TraceEventType.AGENT_RESPONSE.value
+
+
+def _format_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Render a stored event with an ISO-8601 timestamp"""
+    return {
+        "type": event["type"],
+        "timestamp": datetime.fromtimestamp(event["timestamp_ns"] / 1e9).isoformat(),
+        "data": event["data"]
+    }
+
+
 class TraceLogger:
     """Trace logger for workflow execution"""
     
-    def __init__(self):
-        self.traces = []
+    def __init__(self, max_traces: int = MAX_TRACES, spill_file: Optional[str] = None):
+        if max_traces < 1:
+            raise ValueError(f"max_traces must be at least 1, got {max_traces}")
+        
+        # Ring buffer: oldest events are dropped (or spilled) once full
+        self.traces = deque(maxlen=max_traces)
+        # Events logged since the last clear, including ones evicted from the buffer
+        self.num_events = 0
         self.current_workflow = None
         self.current_trace_id = None
+        self._spill_fh = open(spill_file, 'a') if spill_file else None
+        if self._spill_fh:
+            atexit.register(self.close)
         
     def log_event(self, event_type: TraceEventType, data: Dict[str, Any]):
         """Log a trace event"""
-        event = {
-            "type": event_type.value,
-            "timestamp": datetime.now().isoformat(),
+        # Timestamps are kept as integers and only formatted on output
+        self._append({
+            "type": _ETYPE_VALS[event_type],
+            "timestamp_ns": time.time_ns(),
             "data": data
-        }
+        })
+        
+    def _append(self, event: Dict[str, Any]):
+        """Store a prebuilt event, spilling the oldest one if the buffer is full"""
+        if self._spill_fh and len(self.traces) == self.traces.maxlen:
+            self._spill(self.traces[0])
         self.traces.append(event)
-        logger.debug(f"Trace event: {event_type.value}")
+        self.num_events += 1
+        logger.debug("Trace event: %s", event["type"])
         
     def start_workflow(self, workflow_name: str, user_input: str) -> str:
         """Log workflow start and return trace ID"""
@@ -71,7 +108,7 @@ class TraceLogger:
         result = {
             "trace_id": self.current_trace_id,
             "status": status,
-            "num_events": len(self.traces)
+            "num_events": self.num_events
         }
         
         self.current_workflow = None
@@ -79,10 +116,15 @@ class TraceLogger:
         
     def log_agent_response(self, agent_name: str, response: str, metadata: Optional[Dict[str, Any]] = None):
         """Log agent response"""
-        self.log_event(TraceEventType.AGENT_RESPONSE, {
-            "agent_name": agent_name,
-            "response": response[:200] if len(response) > 200 else response,  # Truncate long responses
-            "metadata": metadata or {}
+        # Hot path: build the event directly instead of going through log_event
+        self._append({
+            "type": _AGENT_RESPONSE,
+            "timestamp_ns": time.time_ns(),
+            "data": {
+                "agent_name": agent_name,
+                "response": response[:200],  # Truncate long responses
+                "metadata": metadata or {}
+            }
         })
         
     def log_agent_activity(self, agent_name: str, activity: str):
@@ -111,13 +153,29 @@ class TraceLogger:
             
         self.log_event(TraceEventType.ERROR, error_data)
         
+    def _spill(self, event: Dict[str, Any]):
+        """Write an evicted event to the spill file"""
+        try:
+            self._spill_fh.write(json.dumps(_format_event(event), default=str) + "\n")
+            self._spill_fh.flush()
+        except Exception as e:
+            logger.error(f"Failed to spill trace event: {e}")
+        
+    def close(self):
+        """Close the spill file; later evictions are dropped"""
+        if self._spill_fh:
+            self._spill_fh.close()
+            self._spill_fh = None
+        atexit.unregister(self.close)
+        
     def get_traces(self):
         """Get all traces"""
-        return self.traces
+        return [_format_event(event) for event in self.traces]
         
     def clear_traces(self):
         """Clear all traces"""
-        self.traces = []
+        self.traces.clear()
+        self.num_events = 0
         self.current_workflow = None
         self.current_trace_id = None
 
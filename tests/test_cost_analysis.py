@@ -0,0 +1,10 @@
+from src.utils.metrics.cost_analysis import iter_cost_log, load_cost_log, summarize_cost_log
+
+
+def test_empty_cost_log_file(tmp_path):
+    log_file = tmp_path / "cost_log.csv"
+    log_file.touch()
+    
+    assert list(iter_cost_log(str(log_file))) == []
+    assert not summarize_cost_log(iter_cost_log(str(log_file)))
+    assert load_cost_log(str(log_file)).empty
@@ -0,0 +1,80 @@
+import atexit
+import csv
+
+from src.utils.metrics import cost_tracker
+from src.utils.metrics.cost_tracker import CostTracker
+
+
+def _track(tracker, n):
+    for i in range(n):
+        tracker.track_call("s1", "Planner", "gpt-4o-mini", "openai", 100 + i, 50)
+
+
+def _crash(tracker):
+    """Leave the tracker as a killed process would: data written, no checkpoint"""
+    tracker.flush()
+    atexit.unregister(tracker.close)
+
+
+def _csv_rows(log_dir):
+    with open(log_dir / "cost_log.csv", newline="") as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+def test_torn_journal_tail_is_dropped(tmp_path):
+    tracker = CostTracker(log_dir=str(tmp_path))
+    _track(tracker, 30)
+    _crash(tracker)
+    
+    # Crash mid-write: half a journal line with no trailing newline
+    with open(tmp_path / "session_costs.jsonl", "ab") as f:
+        f.write(b'{"session_id": "s1", "agent": "Plan')
+    
+    tracker = CostTracker(log_dir=str(tmp_path))
+    assert tracker.get_session_cost("s1")["total_calls"] == 30
+    _track(tracker, 5)
+    _crash(tracker)
+    
+    tracker = CostTracker(log_dir=str(tmp_path))
+    try:
+        assert tracker.get_session_cost("s1")["total_calls"] == 35 == _csv_rows(tmp_path)
+    finally:
+        tracker.close()
+
+
+def test_failed_checkpoint_keeps_journal_open(tmp_path, monkeypatch):
+    tracker = CostTracker(log_dir=str(tmp_path))
+    _track(tracker, 3)
+    tracker.flush()
+    
+    def fail_open(*args, **kwargs):
+        raise OSError("disk full")
+    
+    monkeypatch.setattr(cost_tracker, "open", fail_open, raising=False)
+    tracker._checkpoint()
+    monkeypatch.undo()
+    
+    _track(tracker, 2)
+    _crash(tracker)
+    
+    tracker = CostTracker(log_dir=str(tmp_path))
+    try:
+        assert tracker.get_session_cost("s1")["total_calls"] == 5 == _csv_rows(tmp_path)
+    finally:
+        tracker.close()
+
+
+def test_reset_clears_in_memory_totals(tmp_path):
+    tracker = CostTracker(log_dir=str(tmp_path))
+    try:
+        _track(tracker, 3)
+        tracker.reset()
+        assert tracker.get_session_cost("s1") is None
+        assert tracker.generate_summary()["total_calls"] == 0
+        
+        _track(tracker, 2)
+        assert tracker.get_session_cost("s1")["total_calls"] == 2
+        tracker.flush()
+        assert _csv_rows(tmp_path) == 5
+    finally:
+        tracker.close()